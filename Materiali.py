@@ -0,0 +1,18 @@
+'''
+PARAMETRI FISICI DEI MATERIALI
+
+materiali (dict): Parametri fisici dei mezzi e colore per i grafici
+
+	dE(float): Perdita per ionizzazione in una lunghezza di radiazione [MeV]
+
+	X0(float): Lunghezza di radiazione [cm]
+
+	Ec(list): Energie critiche per elettroni (Ec[0]) e positroni (Ec[1]) [MeV]
+
+	color(str): Colore associato al materiale nei grafici
+'''
+
+materiali = {
+	"Ice": {"dE": 1.822, "X0": 39.31, "Ec": [78.60, 76.50], "color": "blue"},
+	"Concrete": {"dE": 3.935, "X0": 11.55, "Ec": [49.90, 48.50], "color": "gray"}
+}
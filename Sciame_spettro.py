@@ -0,0 +1,349 @@
+import argparse
+import numpy as np
+
+'''
+SIMULAZIONE DI SCIAMI DA UNO SPETTRO DI PARTICELLE PRIMARIE
+
+Il codice simula una popolazione di particelle primarie con energie estratte
+da uno spettro (legge di potenza dN/dE ~ E^-indice tra E_min ed E_max,
+oppure istogramma fornito dall'utente) e tipo estratto da una miscela di
+elettroni, fotoni e positroni.
+Tutti gli sciami di un lotto evolvono insieme come un'unica popolazione
+vettorizzata con NumPy, con le stesse regole di Sciame.step: ogni particella
+ricorda l'indice della primaria da cui discende, così che le grandezze per
+sciame si ottengono con np.bincount senza costruire oggetti Sciame.
+Poiché le energie sono estratte dallo spettro, le medie sulle primarie sono
+già pesate con il flusso.
+
+INPUT (argparse):
+
+	N(int): Numero di particelle primarie
+
+	s(float): Passo della simulazione in frazioni di X0
+
+	dE(float): Perdita di energia per ionizzazione per unità di passo
+
+	Ece, Ecp(float): Energie critiche per elettroni e positroni nel mezzo
+
+	X0(float): Lunghezza di radiazione del materiale [cm]
+
+	--indice, --E_min, --E_max(float): Spettro a legge di potenza [MeV]
+
+	--istogramma(str): File con righe "E_inf E_sup conteggi" [MeV],
+	alternativo alla legge di potenza
+
+	--mix(float x3): Frazioni di primarie (e-, gamma, e+), default = 1 0 0
+
+	--lotto(int): Numero di primarie simulate insieme, default = 10000
+
+	--seed(int): Seme del generatore casuale
+
+	--output(str): File .npz in cui salvare i risultati
+
+RISULTATO (stesse unità di Test_statistico.py):
+
+	distanza(np.array): Coordinate spaziali lungo l'asse di sviluppo [cm]
+
+	E_medie, E_err(np.array): Medie di dE/dx ad ogni passo con relativo errore sulla media
+
+	f, el, po_medie, err (np.array): Numero medio di particelle per ogni step con relativo errore sulla media
+
+	E_media, E_media_err(float): Energia totale depositata media con relativo errore sulla media
+
+	Num_totali, Num_totali_err(np.array): Numero medio di fotoni, elettroni e positroni prodotti
+
+	d_max(float): Profondità media del picco dello sciame [cm]
+
+	E0_media(float): Energia primaria media [MeV]
+'''
+
+def campiona_energie(N, rng, indice = None, E_min = None, E_max = None, istogramma = None):
+	'''
+	Estrae le energie delle particelle primarie dallo spettro.
+
+	Parametri:
+
+		N(int): Numero di primarie
+
+		rng(np.random.Generator): Generatore casuale
+
+		indice(float): Indice spettrale della legge di potenza
+
+		E_min, E_max(float): Estremi dello spettro [MeV]
+
+		istogramma(np.array): Righe (E_inf, E_sup, conteggi), alternativo
+		alla legge di potenza
+
+	Returns:
+
+		energie(np.array): Energie delle primarie [MeV]
+	'''
+
+	if istogramma is not None:
+
+		istogramma = np.atleast_2d(np.asarray(istogramma, dtype=float))
+
+		if np.any(istogramma[:, 0] < 0) or np.any(istogramma[:, 1] <= istogramma[:, 0]):
+			raise ValueError("Gli intervalli dell'istogramma devono essere positivi e crescenti")
+
+		if np.any(istogramma[:, 2] < 0) or np.sum(istogramma[:, 2]) <= 0:
+			raise ValueError("I conteggi dell'istogramma devono essere positivi")
+
+		i = rng.choice(len(istogramma), size=N, p=istogramma[:, 2] / np.sum(istogramma[:, 2]))
+		return istogramma[i, 0] + rng.random(N) * (istogramma[i, 1] - istogramma[i, 0])
+
+	if indice is None or E_min is None or E_max is None:
+		raise ValueError("Indicare indice, E_min ed E_max oppure un istogramma")
+
+	if E_min <= 0 or E_max <= E_min:
+		raise ValueError("Lo spettro richiede 0 < E_min < E_max")
+
+	u = rng.random(N)
+
+	if indice == 1:
+		return E_min * (E_max / E_min)**u
+
+	a = 1 - indice
+	return (E_min**a + u * (E_max**a - E_min**a))**(1 / a)
+
+def simula_lotto(E0, segni, dE, s, Ec, rng):
+	'''
+	Simula insieme gli sciami generati da un lotto di primarie.
+
+	Parametri:
+
+		E0(np.array): Energie delle primarie [MeV]
+
+		segni(np.array): Tipo delle primarie (-1: e-, 0: gamma, 1: e+)
+
+		dE(float): Perdita per ionizzazione in una lunghezza di
+		radiazione [MeV]
+
+		s(float): Passo della simulazione
+
+		Ec(list): Energie critiche per elettroni (Ec[0]) e positroni
+		(Ec[1]) [MeV]
+
+		rng(np.random.Generator): Generatore casuale
+
+	Returns:
+
+		somme, quadrati(np.array): Somme sulle primarie delle grandezze
+		per step e dei loro quadrati, dimensione (4, t) con righe
+		(dE/dx, fotoni, elettroni, positroni)
+
+		E_tot(np.array): Energia totale depositata per primaria
+
+		idmax(np.array): Step del picco di deposizione per primaria
+
+		contatore_tot(np.array): Particelle prodotte per tipo
+		(fotoni, elettroni, positroni), sommate sulle primarie
+	'''
+
+	N = len(E0)
+	soglia = dE * s
+	p_emissione = 1 - np.exp( -s )
+	p_coppie = 1 - np.exp( (- 7/9) * s )
+
+	energia = np.array(E0, dtype=float)
+	tipo = np.array(segni, dtype=np.int8)
+	prim = np.arange(N)
+
+	somme, quadrati = [], []
+	E_tot = np.zeros(N)
+	E_picco = np.full(N, -np.inf)
+	idmax = np.zeros(N, dtype=int)
+	contatore_tot = np.array([np.sum(tipo == 0), np.sum(tipo == -1), np.sum(tipo == 1)])
+
+	t = 0
+
+	while len(energia) > 0:
+
+		fotoni = tipo == 0
+		elettroni = tipo == -1
+		positroni = tipo == 1
+		carichi = ~fotoni
+
+		dep = np.zeros(len(energia))
+
+		fermi = carichi & (energia < soglia)
+		dep[fermi] = energia[fermi] * rng.random(np.count_nonzero(fermi))
+
+		attivi = carichi & ~fermi
+		Ec_p = np.where(elettroni, Ec[0], Ec[1])
+		emette = np.zeros(len(energia), dtype=bool)
+		emette[attivi] = rng.random(np.count_nonzero(attivi)) < p_emissione
+		emette &= energia > Ec_p
+
+		energia[emette] /= 2
+		E_brems = energia[emette]
+		prim_brems = prim[emette]
+
+		energia[attivi] -= soglia
+		dep[attivi] += soglia
+
+		bassi = fotoni & (energia <= 2 * 0.511)
+		dep[bassi] = energia[bassi] * rng.random(np.count_nonzero(bassi))
+
+		alti = fotoni & ~bassi
+		converte = np.zeros(len(energia), dtype=bool)
+		converte[alti] = rng.random(np.count_nonzero(alti)) < p_coppie
+		E_coppie = energia[converte] / 2
+		prim_coppie = prim[converte]
+
+		dep_prim = np.bincount(prim, weights=dep, minlength=N)
+		grandezze = np.array([
+			dep_prim,
+			np.bincount(prim[fotoni], minlength=N),
+			np.bincount(prim[elettroni], minlength=N),
+			np.bincount(prim[positroni], minlength=N)
+		])
+		somme.append(np.sum(grandezze, axis=1))
+		quadrati.append(np.sum(grandezze**2, axis=1))
+
+		E_tot += dep_prim
+		picco = dep_prim > E_picco
+		E_picco[picco] = dep_prim[picco]
+		idmax[picco] = t
+
+		contatore_tot += [len(E_brems), len(E_coppie), len(E_coppie)]
+
+		resta = attivi | (alti & ~converte)
+		n_coppie = len(E_coppie)
+
+		energia = np.concatenate([energia[resta], E_brems, E_coppie, E_coppie])
+		tipo = np.concatenate([tipo[resta], np.zeros(len(E_brems), dtype=np.int8),
+			np.full(n_coppie, -1, dtype=np.int8), np.full(n_coppie, 1, dtype=np.int8)])
+		prim = np.concatenate([prim[resta], prim_brems, prim_coppie, prim_coppie])
+
+		t += 1
+
+	return np.array(somme).T, np.array(quadrati).T, E_tot, idmax, contatore_tot
+
+def simula_spettro(N, dE, s, Ec, X0, mix = (1, 0, 0), lotto = 10000, seed = None, **spettro):
+	'''
+	Simula N primarie estratte da uno spettro e calcola i profili
+	longitudinali medi pesati con il flusso.
+
+	Parametri:
+
+		N(int): Numero di particelle primarie
+
+		dE(float): Perdita per ionizzazione in una lunghezza di
+		radiazione [MeV]
+
+		s(float): Passo della simulazione
+
+		Ec(list): Energie critiche per elettroni (Ec[0]) e positroni
+		(Ec[1]) [MeV]
+
+		X0(float): Lunghezza di radiazione del materiale [cm]
+
+		mix(tuple): Frazioni di primarie (e-, gamma, e+), default = (1, 0, 0)
+
+		lotto(int): Numero di primarie simulate insieme, default = 10000
+
+		seed(int): Seme del generatore casuale
+
+		spettro: Argomenti di campiona_energie (indice, E_min, E_max
+		oppure istogramma)
+
+	Returns:
+
+		risultato(dict): Profili medi e totali con i relativi errori
+	'''
+
+	if N <= 0 or lotto <= 0:
+		raise ValueError("Il numero di primarie e la dimensione del lotto devono essere positivi")
+
+	if dE < 0:
+		raise ValueError("La perdita di energia per lunghezza di ionizzazione deve essere positiva ")
+
+	if Ec[0] < 0 or Ec[1] < 0 :
+		raise ValueError("Le energie critiche devono essere positive")
+
+	if s <= 0 or s > 1 :
+		raise ValueError("Il passo deve essere compreso tra 0 e 1")
+
+	mix = np.asarray(mix, dtype=float)
+	if len(mix) != 3 or np.any(mix < 0) or np.sum(mix) <= 0:
+		raise ValueError("La miscela deve contenere tre frazioni positive (e-, gamma, e+)")
+
+	rng = np.random.default_rng(seed)
+
+	somme = np.zeros((4, 0))
+	quadrati = np.zeros((4, 0))
+	E_tot = np.zeros(N)
+	idmax = np.zeros(N, dtype=int)
+	contatore_tot = np.zeros(3)
+	E0_somma = 0.0
+
+	for inizio in range(0, N, lotto):
+
+		n = min(lotto, N - inizio)
+		E0 = campiona_energie(n, rng, **spettro)
+		segni = rng.choice([-1, 0, 1], size=n, p=mix / np.sum(mix))
+
+		S, Q, E_tot[inizio:inizio + n], idmax[inizio:inizio + n], c = simula_lotto(E0, segni, dE, s, Ec, rng)
+
+		t_max = max(somme.shape[1], S.shape[1])
+		somme = np.pad(somme, ((0, 0), (0, t_max - somme.shape[1]))) + np.pad(S, ((0, 0), (0, t_max - S.shape[1])))
+		quadrati = np.pad(quadrati, ((0, 0), (0, t_max - quadrati.shape[1]))) + np.pad(Q, ((0, 0), (0, t_max - Q.shape[1])))
+		contatore_tot += c
+		E0_somma += np.sum(E0)
+
+	medie = somme / N
+	err = np.sqrt(np.maximum(quadrati / N - medie**2, 0)) / np.sqrt(N)
+	Num_totali = contatore_tot / N
+
+	return {
+		"distanza": np.arange(medie.shape[1]) * s * X0,
+		"E_medie": medie[0], "E_err": err[0],
+		"f_medie": medie[1], "f_err": err[1],
+		"el_medie": medie[2], "el_err": err[2],
+		"po_medie": medie[3], "po_err": err[3],
+		"E_media": float(np.mean(E_tot)),
+		"E_media_err": float(np.std(E_tot) / np.sqrt(N)),
+		"Num_totali": Num_totali,
+		"Num_totali_err": np.sqrt(Num_totali),
+		"d_max": float(np.mean(idmax) * s * X0),
+		"E0_media": E0_somma / N
+	}
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description="Sciami elettromagnetici da uno spettro di primarie")
+	parser.add_argument("N", type=int, help="Numero di particelle primarie")
+	parser.add_argument("s", type=float, help="Passo della simulazione")
+	parser.add_argument("dE", type=float, help="Perdita per ionizzazione [MeV]")
+	parser.add_argument("Ece", type=float, help="Energia critica elettrone [MeV]")
+	parser.add_argument("Ecp", type=float, help="Energia critica positrone [MeV]")
+	parser.add_argument("X0", type=float, help="Lunghezza di radiazione [cm]")
+	parser.add_argument("--indice", type=float, default=2.0, help="Indice spettrale (dN/dE ~ E^-indice)")
+	parser.add_argument("--E_min", type=float, default=10.0, help="Energia minima dello spettro [MeV]")
+	parser.add_argument("--E_max", type=float, default=1e4, help="Energia massima dello spettro [MeV]")
+	parser.add_argument("--istogramma", default=None, help="File con righe 'E_inf E_sup conteggi' [MeV]")
+	parser.add_argument("--mix", type=float, nargs=3, default=[1, 0, 0], help="Frazioni di primarie (e-, gamma, e+)")
+	parser.add_argument("--lotto", type=int, default=10000, help="Primarie simulate insieme")
+	parser.add_argument("--seed", type=int, default=None, help="Seme del generatore casuale")
+	parser.add_argument("--output", default=None, help="File .npz in cui salvare i risultati")
+	args = parser.parse_args()
+
+	if args.istogramma is not None:
+		spettro = {"istogramma": np.loadtxt(args.istogramma)}
+	else:
+		spettro = {"indice": args.indice, "E_min": args.E_min, "E_max": args.E_max}
+
+	print(f"Avvio simulazione di {args.N} primarie")
+
+	risultato = simula_spettro(args.N, args.dE, args.s, [args.Ece, args.Ecp], args.X0,
+		args.mix, args.lotto, args.seed, **spettro)
+
+	print(f"- Energia primaria media: {risultato['E0_media']:.1f} MeV\n"
+		f"- Energia depositata media: {risultato['E_media']:.1f} +- {risultato['E_media_err']:.1f} MeV\n"
+		f"- Profondità media del picco: {risultato['d_max']:.1f} cm\n"
+		f"- Particelle medie prodotte (gamma, e-, e+): {np.round(risultato['Num_totali'], 2)}")
+
+	if args.output is not None:
+		np.savez(args.output, **risultato)
+		print(f"Risultati salvati in {args.output}")
@@ -0,0 +1,299 @@
+from Particella import Particella
+from Fotone import Fotone
+from Sciame_EM import Sciame
+from Materiali import materiali
+import argparse
+import random
+import numpy as np
+
+'''
+SCIAME ELETTROMAGNETICO IN UN ASSORBITORE A STRATI
+
+Il codice simula lo sciame in una pila di strati di materiali diversi
+(ad esempio un calorimetro a campionamento con strati alternati di cemento
+e ghiaccio). La pila, data come lista di (materiale, spessore [cm]), viene
+convertita una sola volta in tabelle indicizzate dal numero del passo con
+strato, soglia di ionizzazione, energie critiche e probabilità di emissione
+e di produzione di coppie; il ciclo di step legge i parametri del mezzo
+direttamente dalle tabelle.
+Ogni strato è percorso con passi di lunghezza s * X0 del proprio materiale,
+più un passo finale più corto che copre la parte restante dello spessore.
+Le particelle che superano la fine della pila escono dall'assorbitore e la
+loro energia viene registrata come energia di fuga.
+
+INPUT (argparse):
+
+	E0(float): Energia della particella primaria [MeV]
+
+	segno(int): Tipo di particella iniziale (1: e+, -1: e-, 0: gamma)
+
+	s(float): Passo della simulazione in frazioni della X0 di ogni strato
+
+	n(int): Numero di sciami per la media statistica
+
+	--strati(list): Strati nella forma materiale:spessore [cm], con i
+	materiali definiti in Materiali.py
+
+	--ripeti(int): Numero di ripetizioni della sequenza di strati
+
+RISULTATO:
+
+	Energia media depositata in ogni strato ed energia media di fuga, con
+	relativo errore sulla media
+'''
+
+class SciameStrati(Sciame):
+
+	def __init__(self, E0, strati, s, segno = -1):
+		'''
+		Crea lo sciame elettromagnetico in un assorbitore a strati
+
+		Parametri:
+
+			E0(float): Energia iniziale [MeV]
+
+			strati(list): Coppie (materiale, spessore [cm]), dove materiale
+			è un nome di Materiali.py o un dict con dE, X0 ed Ec
+
+			s(float): Passo della simulazione in frazioni della lunghezza
+			di radiazione di ogni strato
+
+			segno(int): Identifica la particella iniziale, -1 elettrone,
+			 +1 positrone e 0 fotone, default = -1
+
+		Attributi:
+
+			strato_step, soglia_step, Ece_step, Ecp_step, dE_step(np.array):
+			Tabelle per passo con strato, soglia di ionizzazione, energie
+			critiche e perdita per ionizzazione [MeV]
+
+			s_step, p_emissione_step, p_coppie_step(np.array): Tabelle per
+			passo con lunghezza del passo in frazioni di X0 e probabilità
+			di emissione e di produzione di coppie
+
+			distanza(np.array): Profondità all'inizio di ogni passo [cm]
+
+			en_strati(np.array): Energia depositata in ogni strato [MeV]
+
+			en_fuga(float): Energia delle particelle uscite dalla fine
+			della pila [MeV]
+		'''
+
+		if len(strati) == 0:
+			raise ValueError("La pila deve contenere almeno uno strato")
+
+		mezzi = []
+
+		for materiale, spessore in strati:
+
+			if isinstance(materiale, str):
+
+				if materiale not in materiali:
+					raise ValueError(f"Materiale sconosciuto: {materiale}")
+				materiale = materiali[materiale]
+
+			if spessore <= 0:
+				raise ValueError("Lo spessore degli strati deve essere positivo")
+
+			if materiale["X0"] <= 0:
+				raise ValueError("La lunghezza di radiazione deve essere positiva")
+
+			mezzi.append((materiale, spessore))
+
+		primo = mezzi[0][0]
+		super().__init__(E0, primo["dE"], s, primo["Ec"], segno)
+
+		strato, s_step = [], []
+
+		for i, (materiale, spessore) in enumerate(mezzi):
+
+			if materiale["dE"] < 0 or materiale["Ec"][0] < 0 or materiale["Ec"][1] < 0:
+				raise ValueError("Perdita per ionizzazione ed energie critiche devono essere positive")
+
+			X = spessore / materiale["X0"]
+			passi = int(np.floor(X / s * (1 + 1e-12)))
+			resto = X - passi * s
+
+			strato += [i] * passi
+			s_step += [s] * passi
+
+			if resto > 1e-9 * X:
+
+				strato.append(i)
+				s_step.append(resto)
+
+		self.strato_step = np.array(strato)
+		self.s_step = np.array(s_step)
+
+		X0_step = np.array([m["X0"] for m, _ in mezzi])[self.strato_step]
+		self.distanza = np.concatenate([[0.0], np.cumsum(self.s_step * X0_step)[:-1]])
+
+		self.p_emissione_step = 1 - np.exp( -self.s_step )
+		self.p_coppie_step = 1 - np.exp( (- 7/9) * self.s_step )
+
+		self.soglia_step = np.array([m["dE"] for m, _ in mezzi])[self.strato_step] * self.s_step
+		self.Ece_step = np.array([m["Ec"][0] for m, _ in mezzi])[self.strato_step]
+		self.Ecp_step = np.array([m["Ec"][1] for m, _ in mezzi])[self.strato_step]
+		self.dE_step = np.array([m["dE"] for m, _ in mezzi])[self.strato_step]
+
+		self.en_strati = np.zeros(len(mezzi))
+		self.en_fuga = 0.0
+
+	def step(self):
+		'''
+		Simula i passi dello sciame attraverso la pila di strati, finché ci
+		sono particelle in grado di cedere energia o finché lo sciame non
+		esce dall'ultimo strato.
+
+		Parametri:
+
+			None
+
+		Attributi modificati:
+
+			Gli stessi di Sciame.step, più
+
+			en_strati(np.array): Aggiunge l'energia depositata in ogni
+			strato
+
+			en_fuga(float): Energia delle particelle ancora attive alla
+			fine della pila
+
+		Returns:
+
+			None
+		'''
+
+		strato_step = self.strato_step.tolist()
+		soglia_step = self.soglia_step.tolist()
+		Ece_step = self.Ece_step.tolist()
+		Ecp_step = self.Ecp_step.tolist()
+		dE_step = self.dE_step.tolist()
+		s_step = self.s_step.tolist()
+		p_emissione_step = self.p_emissione_step.tolist()
+		p_coppie_step = self.p_coppie_step.tolist()
+
+		while len(self.lista) > 0:
+
+			if self.t >= len(strato_step):
+
+				self.en_fuga += sum(p.energia for p in self.lista)
+				self.lista = []
+				break
+
+			soglia = soglia_step[self.t]
+			Ece = Ece_step[self.t]
+			Ecp = Ecp_step[self.t]
+			dE = dE_step[self.t]
+			s = s_step[self.t]
+			p_emissione = p_emissione_step[self.t]
+			p_coppie = p_coppie_step[self.t]
+
+			lista_nuova = []
+			en_contatore = 0
+			f_contatore, el_contatore, po_contatore = 0, 0, 0
+
+			for p in self.lista:
+
+				if (type(p) == Particella):
+
+					if(p.segno == -1):
+
+						el_contatore += 1
+
+					else:
+
+						po_contatore +=1
+
+					if (p.energia < soglia):
+
+						en_contatore += p.energia * random.random()
+						continue
+
+					else:
+
+						if (random.random() < p_emissione):
+
+							if((p.segno == -1 and p.energia > Ece) or (p.segno == +1 and p.energia > Ecp)):
+
+								p.emissione(lista_nuova)
+								self.contatore_tot[0] +=1
+
+						p.energia -= soglia
+						en_contatore += soglia
+						lista_nuova.append(p)
+
+				elif (type(p) == Fotone):
+
+					f_contatore += 1
+
+					if (p.energia > 2 * 0.511):
+
+						if (random.random() < p_coppie):
+
+							p.coppie(lista_nuova, dE, s)
+
+							self.contatore_tot[1] += 1
+							self.contatore_tot[2] += 1
+							continue
+
+						else:
+
+							lista_nuova.append(p)
+
+					else:
+
+						en_contatore += p.energia * random.random()
+						continue
+
+			self.en_strati[strato_step[self.t]] += en_contatore
+
+			self.lista = lista_nuova
+			self.t += 1
+			self.en_ionizzazione_step.append(en_contatore)
+			self.contatore_step[0].append(f_contatore)
+			self.contatore_step[1].append(el_contatore)
+			self.contatore_step[2].append(po_contatore)
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description="Sciame elettromagnetico in un assorbitore a strati")
+	parser.add_argument("E0", type=float, help="Energia della particella iniziale")
+	parser.add_argument("segno", type=int, choices=[-1,0,1], help="Segno della particella iniziale")
+	parser.add_argument("s", type=float, help="Passo della simulazione")
+	parser.add_argument("n", type=int, help="Numero di sciami da simulare")
+	parser.add_argument("--strati", nargs="+", default=["Concrete:10", "Ice:20"], help="Strati come materiale:spessore [cm]")
+	parser.add_argument("--ripeti", type=int, default=10, help="Ripetizioni della sequenza di strati")
+	args = parser.parse_args()
+
+	strati = []
+	for voce in args.strati:
+
+		nome, _, spessore = voce.partition(":")
+		strati.append((nome, float(spessore)))
+
+	strati = strati * args.ripeti
+
+	print(f"Avvio simulazione di {args.n} sciami in {len(strati)} strati")
+
+	en_strati = []
+	en_fuga = []
+
+	for i in range(args.n):
+
+		s1 = SciameStrati(args.E0, strati, args.s, args.segno)
+		s1.step()
+
+		en_strati.append(s1.en_strati)
+		en_fuga.append(s1.en_fuga)
+
+	medie = np.mean(en_strati, axis=0)
+	err = np.std(en_strati, axis=0) / np.sqrt(args.n)
+
+	inizio = 0.0
+	for (nome, spessore), E, E_err in zip(strati, medie, err):
+
+		print(f"{inizio:>8.1f} - {inizio + spessore:>8.1f} cm  {nome:>10}: {E:.2f} +- {E_err:.2f} MeV")
+		inizio += spessore
+
+	print(f"Energia di fuga: {np.mean(en_fuga):.2f} +- {np.std(en_fuga) / np.sqrt(args.n):.2f} MeV")
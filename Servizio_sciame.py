@@ -0,0 +1,470 @@
+import asyncio
+import argparse
+import io
+import json
+import math
+import os
+import random
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+from Sciame_EM import Sciame
+
+'''
+SERVIZIO LOCALE DI SIMULAZIONE DI SCIAMI ELETTROMAGNETICI
+
+Il codice avvia un servizio asyncio (HTTP su 127.0.0.1 oppure socket Unix)
+che esegue le stesse simulazioni di Test_statistico.py senza dover
+rilanciare l'interprete ad ogni richiesta.
+I processi di calcolo restano attivi in un pool, le richieste identiche
+in corso vengono eseguite una sola volta e i risultati sono conservati in
+una cache LRU indicizzata dall'insieme completo dei parametri e dal seme.
+Il servizio non effettua alcun accesso alla rete esterna.
+
+RICHIESTA:
+
+	GET /simula?E0=...&segno=...&s=...&dE=...&Ece=...&Ecp=...&n=...&X0=...&seed=...&formato=json|npz
+
+	seed(int): Seme del generatore casuale, default = 0
+
+	formato(str): "json" (default) oppure "npz"
+
+	GET /stato: Dimensione della cache e numero di richieste in corso
+
+RISPOSTA:
+
+	distanza(array): Coordinate spaziali lungo l'asse di sviluppo [cm]
+
+	E_medie, E_err(array): Medie di dE/dx ad ogni passo con relativo errore sulla media
+
+	f, el, po_medie, err (array): Numero medio di particelle per ogni step con relativo errore sulla media
+
+	E_media, E_media_err(float): Energia totale depositata media con relativo errore sulla media
+
+	Num_totali, Num_totali_err(array): Numero medio di fotoni, elettroni e positroni prodotti
+
+	d_max(float): Profondità media del picco dello sciame [cm]
+
+INPUT (argparse):
+
+	--host, --porta: Indirizzo e porta del servizio HTTP, default = 127.0.0.1:8765
+
+	--socket: Percorso di un socket Unix da usare al posto di host e porta
+
+	--processi: Numero di processi del pool di calcolo
+
+	--cache: Numero massimo di risultati conservati nella cache
+
+	--limite: Numero massimo stimato di passi-particella, n * E0 / (dE * s),
+	accettato per una richiesta
+'''
+
+PARAMETRI = {
+	"E0": float, "segno": int, "s": float, "dE": float,
+	"Ece": float, "Ecp": float, "n": int, "X0": float, "seed": int
+}
+
+def _riscalda():
+	'''
+	Inizializza un processo del pool importando i moduli necessari, in
+	modo che la prima richiesta non paghi il costo di avvio.
+
+	Parametri:
+
+		None
+
+	Returns:
+
+		None
+	'''
+
+	Sciame(1.0, 1.0, 1.0, [1.0, 1.0], -1).step()
+
+def _pronto():
+	'''
+	Attività vuota usata per avviare i processi del pool all'accensione
+	del servizio.
+
+	Parametri:
+
+		None
+
+	Returns:
+
+		pid(int): Identificativo del processo che l'ha eseguita
+	'''
+
+	return os.getpid()
+
+def valida(chiave, limite):
+	'''
+	Controlla i parametri di una richiesta prima di inviarla al pool, così
+	che valori non finiti, perdite per ionizzazione nulle (con dE = 0 le
+	particelle sotto Ec non si fermano mai) o simulazioni troppo lunghe non
+	blocchino un processo di calcolo.
+	Il costo è stimato con il numero di passi-particella n * E0 / (dE * s):
+	ogni particella carica cede al più dE * s per passo.
+
+	Parametri:
+
+		chiave(tuple): Valori dei parametri nell'ordine di PARAMETRI
+
+		limite(float): Numero massimo stimato di passi-particella
+
+	Returns:
+
+		None: Solleva ValueError se i parametri non sono accettabili
+	'''
+
+	valori = dict(zip(PARAMETRI, chiave))
+
+	for nome, valore in valori.items():
+		if not math.isfinite(valore):
+			raise ValueError(f"Il parametro {nome} deve essere finito")
+
+	if valori["n"] <= 0:
+		raise ValueError("Il numero di sciami deve essere positivo")
+
+	if valori["E0"] < 0:
+		raise ValueError("L'energia iniziale deve essere positiva")
+
+	if valori["dE"] <= 0:
+		raise ValueError("La perdita per ionizzazione deve essere strettamente positiva")
+
+	if valori["s"] <= 0 or valori["s"] > 1:
+		raise ValueError("Il passo deve essere compreso tra 0 e 1")
+
+	passi = valori["n"] * valori["E0"] / (valori["dE"] * valori["s"])
+	if passi > limite:
+		raise ValueError(f"La richiesta richiede circa {passi:.3g} passi-particella, oltre il limite di {limite:g}")
+
+def simula(E0, segno, s, dE, Ece, Ecp, n, X0, seed):
+	'''
+	Simula n sciami e ne calcola i profili longitudinali medi, come in
+	Test_statistico.py.
+
+	Parametri:
+
+		E0(float): Energia della particella primaria [MeV]
+
+		segno(int): Tipo di particella iniziale (1: e+, -1: e-, 0: gamma)
+
+		s(float): Passo della simulazione in frazioni di X0
+
+		dE(float): Perdita di energia per ionizzazione per unità di passo
+
+		Ece, Ecp(float): Energie critiche per elettroni e positroni nel mezzo
+
+		n(int): Numero di sciami per la media statistica
+
+		X0(float): Lunghezza di radiazione del materiale [cm]
+
+		seed(int): Seme del generatore casuale
+
+	Returns:
+
+		risultato(dict): Profili medi e totali con i relativi errori
+	'''
+
+	if n <= 0:
+		raise ValueError("Il numero di sciami deve essere positivo")
+
+	random.seed(seed)
+
+	sciami = []
+	E_totali = []
+	Num_totali = np.zeros(3)
+	d_max = 0
+
+	for i in range(n):
+
+		s1 = Sciame(E0, dE, s, [Ece, Ecp], segno)
+		s1.step()
+		sciami.append(s1)
+
+		E_totali.append(s1.energia_totale())
+		Num_totali += np.array(s1.contatore_tot)
+		d_max += np.argmax(np.array(s1.en_ionizzazione_step))
+
+	d_max = d_max * s * X0 / n
+	Num_totali = Num_totali / n
+
+	t_max = max(s1.t for s1 in sciami)
+
+	E_matrice = np.zeros((n, t_max))
+	N_matrice = np.zeros((3, n, t_max))
+
+	for i, s1 in enumerate(sciami):
+
+		E_matrice[i, :s1.t] = s1.en_ionizzazione_step
+		N_matrice[:, i, :s1.t] = s1.contatore_step
+
+	N_medie = np.mean(N_matrice, axis=1)
+	N_err = np.std(N_matrice, axis=1) / np.sqrt(n)
+
+	return {
+		"distanza": np.arange(t_max) * s * X0,
+		"E_medie": np.mean(E_matrice, axis=0),
+		"E_err": np.std(E_matrice, axis=0) / np.sqrt(n),
+		"f_medie": N_medie[0], "f_err": N_err[0],
+		"el_medie": N_medie[1], "el_err": N_err[1],
+		"po_medie": N_medie[2], "po_err": N_err[2],
+		"E_media": float(np.mean(E_totali)),
+		"E_media_err": float(np.std(E_totali) / np.sqrt(n)),
+		"Num_totali": Num_totali,
+		"Num_totali_err": np.sqrt(Num_totali),
+		"d_max": float(d_max)
+	}
+
+class Servizio:
+
+	def __init__(self, processi = None, capacita = 128, limite = 1e8):
+		'''
+		Crea il servizio di simulazione.
+
+		Parametri:
+
+			processi(int): Numero di processi del pool, default = numero
+			di CPU
+
+			capacita(int): Numero massimo di risultati in cache,
+			default = 128
+
+			limite(float): Numero massimo stimato di passi-particella,
+			n * E0 / (dE * s), accettato per una richiesta, default = 1e8
+
+		Attributi:
+
+			cache(OrderedDict): Risultati già calcolati, dal meno al più
+			recentemente usato
+
+			in_corso(dict): Future delle simulazioni in esecuzione,
+			indicizzate dai parametri
+		'''
+
+		if capacita < 0:
+			raise ValueError("La capacità della cache deve essere positiva")
+		self.capacita = capacita
+		self.limite = limite
+
+		self.processi = processi or os.cpu_count() or 1
+		self.pool = ProcessPoolExecutor(max_workers = self.processi, initializer = _riscalda)
+		self.cache = OrderedDict()
+		self.in_corso = {}
+
+	async def risultato(self, chiave):
+		'''
+		Restituisce il risultato della simulazione identificata da chiave,
+		usando la cache o unendosi a una simulazione identica già in corso.
+
+		Parametri:
+
+			chiave(tuple): Valori dei parametri nell'ordine di PARAMETRI
+
+		Returns:
+
+			risultato(dict): Risultato di simula
+		'''
+
+		if chiave in self.cache:
+
+			self.cache.move_to_end(chiave)
+			return self.cache[chiave]
+
+		if chiave not in self.in_corso:
+
+			loop = asyncio.get_running_loop()
+			futuro = loop.run_in_executor(self.pool, simula, *chiave)
+			futuro.add_done_callback(lambda f: self.concluso(chiave, f))
+			self.in_corso[chiave] = futuro
+
+		return await asyncio.shield(self.in_corso[chiave])
+
+	def concluso(self, chiave, futuro):
+		'''
+		Rimuove una simulazione conclusa da quelle in corso e, se è
+		terminata senza errori, ne salva il risultato nella cache.
+
+		Parametri:
+
+			chiave(tuple): Valori dei parametri nell'ordine di PARAMETRI
+
+			futuro(Future): Future della simulazione conclusa
+
+		Returns:
+
+			None
+		'''
+
+		self.in_corso.pop(chiave, None)
+
+		if futuro.cancelled() or futuro.exception() is not None or self.capacita == 0:
+			return
+
+		self.cache[chiave] = futuro.result()
+		self.cache.move_to_end(chiave)
+
+		while len(self.cache) > self.capacita:
+			self.cache.popitem(last = False)
+
+	async def gestisci(self, reader, writer):
+		'''
+		Gestisce una connessione HTTP con una singola richiesta.
+
+		Parametri:
+
+			reader(StreamReader), writer(StreamWriter): Flussi della
+			connessione
+
+		Returns:
+
+			None
+		'''
+
+		try:
+
+			riga = (await reader.readline()).decode("latin-1").split()
+
+			while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+				pass
+
+			if len(riga) < 2 or riga[0] != "GET":
+
+				stato, tipo, corpo = 405, "application/json", {"errore": "Metodo non supportato"}
+
+			else:
+
+				stato, tipo, corpo = await self.richiesta(riga[1])
+
+		except Exception as e:
+
+			stato, tipo, corpo = 500, "application/json", {"errore": str(e)}
+
+		if tipo == "application/json":
+			corpo = json.dumps(corpo).encode()
+
+		intestazione = (f"HTTP/1.0 {stato} {'OK' if stato == 200 else 'Errore'}\r\n"
+			f"Content-Type: {tipo}\r\n"
+			f"Content-Length: {len(corpo)}\r\n"
+			f"Connection: close\r\n\r\n")
+
+		writer.write(intestazione.encode() + corpo)
+
+		try:
+
+			await writer.drain()
+
+		finally:
+
+			writer.close()
+
+	async def richiesta(self, url):
+		'''
+		Interpreta l'URL di una richiesta e calcola la risposta.
+
+		Parametri:
+
+			url(str): Percorso e parametri della richiesta
+
+		Returns:
+
+			stato(int), tipo(str), corpo(dict o bytes): Codice HTTP, tipo
+			di contenuto e corpo della risposta
+		'''
+
+		parti = urlsplit(url)
+		query = {k: v[-1] for k, v in parse_qs(parti.query).items()}
+
+		if parti.path == "/stato":
+			return 200, "application/json", {"cache": len(self.cache), "in_corso": len(self.in_corso)}
+
+		if parti.path != "/simula":
+			return 404, "application/json", {"errore": f"Percorso sconosciuto: {parti.path}"}
+
+		query.setdefault("seed", "0")
+		formato = query.pop("formato", "json")
+
+		mancanti = [p for p in PARAMETRI if p not in query]
+		if mancanti:
+			return 400, "application/json", {"errore": f"Parametri mancanti: {mancanti}"}
+
+		if formato not in ("json", "npz"):
+			return 400, "application/json", {"errore": "Il formato deve essere json o npz"}
+
+		try:
+
+			chiave = tuple(tipo(query[p]) for p, tipo in PARAMETRI.items())
+			valida(chiave, self.limite)
+			risultato = await self.risultato(chiave)
+
+		except ValueError as e:
+
+			return 400, "application/json", {"errore": str(e)}
+
+		if formato == "npz":
+
+			buffer = io.BytesIO()
+			np.savez(buffer, **risultato)
+			return 200, "application/octet-stream", buffer.getvalue()
+
+		return 200, "application/json", {k: np.asarray(v).tolist() for k, v in risultato.items()}
+
+	async def avvia(self, host = "127.0.0.1", porta = 8765, socket = None):
+		'''
+		Avvia il servizio e resta in ascolto fino all'interruzione.
+
+		Parametri:
+
+			host(str), porta(int): Indirizzo del servizio HTTP
+
+			socket(str): Percorso di un socket Unix, se indicato sostituisce
+			host e porta
+
+		Returns:
+
+			None
+		'''
+
+		loop = asyncio.get_running_loop()
+		await asyncio.gather(*[loop.run_in_executor(self.pool, _pronto) for i in range(self.processi)])
+
+		if socket is not None:
+
+			server = await asyncio.start_unix_server(self.gestisci, path = socket)
+			print(f"Servizio in ascolto su {socket}")
+
+		else:
+
+			server = await asyncio.start_server(self.gestisci, host, porta)
+			print(f"Servizio in ascolto su http://{host}:{porta}")
+
+		try:
+
+			async with server:
+				await server.serve_forever()
+
+		finally:
+
+			self.pool.shutdown(cancel_futures = True)
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description="Servizio locale di simulazione di sciami elettromagnetici")
+	parser.add_argument("--host", default="127.0.0.1", help="Indirizzo del servizio HTTP")
+	parser.add_argument("--porta", type=int, default=8765, help="Porta del servizio HTTP")
+	parser.add_argument("--socket", default=None, help="Socket Unix al posto di host e porta")
+	parser.add_argument("--processi", type=int, default=None, help="Numero di processi del pool")
+	parser.add_argument("--cache", type=int, default=128, help="Numero massimo di risultati in cache")
+	parser.add_argument("--limite", type=float, default=1e8, help="Passi-particella massimi per richiesta, n * E0 / (dE * s)")
+	args = parser.parse_args()
+
+	servizio = Servizio(args.processi, args.cache, args.limite)
+
+	try:
+
+		asyncio.run(servizio.avvia(args.host, args.porta, args.socket))
+
+	except KeyboardInterrupt:
+
+		pass
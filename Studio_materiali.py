@@ -1,7 +1,10 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from Sciame_EM import Sciame
+from Telemetria import Telemetria
+from Materiali import materiali
 import argparse
+from statistics import NormalDist
 
 '''
 SIMULAZIONE DI SCIAMI ELETTROMAGNETICI NEI MATERIALI PER DIVERSE ENERGIE
@@ -24,6 +27,18 @@ INPUT (argparse):
 	M(int): Numero di ripetizioni statistiche per ogni punto di energia
 	
 	segno(int): Particella iniziale (-1: e-, 0: gamma, 1: e+)
+	
+	adattivo(int, opzionale): Budget totale di energie. Se indicato, gli n 
+	campioni formano una griglia iniziale grossolana e i punti successivi 
+	vengono aggiunti solo negli intervalli dove la curvatura di d_STOP e 
+	E_TOT, o della differenza tra i materiali, è maggiore rispetto 
+	all'errore statistico, misurate in scala log-log. Il raffinamento si 
+	ferma prima del budget se nessuna curvatura è statisticamente significativa
+	
+	telemetria(str, opzionale): File su cui scrivere righe JSON di 
+	avanzamento ("-" per stderr)
+	
+	intervallo(float, opzionale): Secondi tra due righe di telemetria
 
 VARIABILI:
 
@@ -31,7 +46,18 @@ VARIABILI:
 	
 	energie (np.array): Vettore delle energie iniziali del campionamento [MeV]
 	
-	materiali (dict): Parametri fisici dei mezzi (dE, X0, Ec) e colore per i grafici
+	punti (dict): Risultati per materiale ed energia, punti[nome][E]
+	
+	materiali (dict): Parametri fisici dei mezzi (dE, X0, Ec) e colore per i grafici, 
+	definiti in Materiali.py
+	
+	telemetria (Telemetria): Registro dell'avanzamento della simulazione. Il 
+	lavoro previsto è la somma delle energie degli sciami; per i punti 
+	adattivi non ancora scelti si usa l'energia media della griglia iniziale
+	
+	lavoro_punto (int): Numero di sciami per ogni punto di energia
+	
+	E_griglia (float): Energia media della griglia iniziale [MeV]
 	
 	risultati (dict): Risultati medi e relativi errori sulla media:
 	
@@ -86,76 +112,210 @@ parser.add_argument("k", type=float, help="Moltiplicatore energia massima (k*10^
 parser.add_argument("s", type=float, help="Passo della simulazione")
 parser.add_argument("M", type=int, help="Ripetizioni statistiche")
 parser.add_argument("segno", type=int, choices=[-1,0,1], help="Segno particella iniziale")
+parser.add_argument("--adattivo", type=int, default=None, help="Budget totale di energie per la griglia adattiva")
+parser.add_argument("--telemetria", default=None, help="File per le righe JSON di avanzamento, '-' per stderr")
+parser.add_argument("--intervallo", type=float, default=10, help="Secondi tra due righe di telemetria")
 args = parser.parse_args()
 
 E_max = args.k * 10**args.b
 energie = np.logspace(0, np.log10(E_max), args.n) 
 
-materiali = {
-	"Ice": {"dE": 1.822, "X0": 39.31, "Ec": [78.60, 76.50], "color": "blue"},
-	"Concrete": {"dE": 3.935, "X0": 11.55, "Ec": [49.90, 48.50], "color": "gray"}
-}
-
-risultati = {}
-for nome in materiali:
-	risultati[nome] = {
-	
-		"d": [], "d_err": [], 
-		"E_tot": [], "E_tot_err": [], 
-		"num_tot": [], "num_tot_err": [], 
-		"d_max": [], "d_max_err": [], 
-		"E_max_tot": [], "E_max_tot_err": [], 
-		"num_max_tot": [], "num_max_tot_err": [] 
-	}
+if args.adattivo is not None and (args.n < 3 or args.adattivo < args.n or E_max <= 1):
+	parser.error("In modalità adattiva servono n >= 3, un budget di punti non inferiore a n ed E_max > 1 MeV")
 
 print(f"\nConfigurazione simulazione per: {list(materiali.keys())}:\n" 
 	f"- Range energia: da 0 a {E_max} MeV\n" 
-	f"- Numero di campioni energetici: {args.n}\n" 
+	f"- Numero di campioni energetici: {args.n}" + (f" (adattivo fino a {args.adattivo})" if args.adattivo is not None else "") + "\n" 
 	f"- Ripetizioni per valore di energia: {args.M}\n" 
 	f"- Passo della simulazione: {args.s}\n")
 
+lavoro_punto = len(materiali) * args.M
+E_griglia = np.mean(energie)
+telemetria = Telemetria(args.telemetria, lavoro_punto * (args.adattivo or args.n), args.intervallo,
+	lavoro_punto * (np.sum(energie) + ((args.adattivo or args.n) - args.n) * E_griglia))
+
+def simula_punto(E, dati):
+	'''
+	Simula M sciami di energia iniziale E in un materiale e ne calcola le
+	grandezze caratteristiche medie con i relativi errori.
+
+	Parametri:
+
+		E(float): Energia iniziale [MeV]
+
+		dati(dict): Parametri fisici del mezzo (dE, X0, Ec)
+
+	Returns:
+
+		punto(dict): Valori medi ed errori, con le stesse chiavi di
+		risultati[nome]
+	'''
+
+	d_temp = []
+	E_tot_temp = []
+	num_tot_temp = np.zeros(3)
+
+	d_max_temp = []
+	E_max_temp = []
+	num_max_temp = []
+
+	for i in range(args.M):
+
+		s1 = Sciame(E, dati["dE"], args.s, dati["Ec"], args.segno)
+		s1.step()
+		telemetria.sciame(s1)
+
+		d_temp.append(s1.t * args.s * dati["X0"])
+		E_tot_temp.append(s1.energia_totale())
+		num_tot_temp += np.array(s1.contatore_tot)
+
+		idmax = np.argmax(s1.en_ionizzazione_step)
+		d_max_temp.append(idmax * args.s * dati["X0"])
+		E_max_temp.append(s1.en_ionizzazione_step[idmax])
+		num_max_temp.append([s1.contatore_step[0][idmax], s1.contatore_step[1][idmax], s1.contatore_step[2][idmax]])
+
+	return {
+
+		"d": np.mean(d_temp), "d_err": np.std(d_temp) / np.sqrt(args.M),
+		"E_tot": np.mean(E_tot_temp), "E_tot_err": np.std(E_tot_temp) / np.sqrt(args.M),
+		"num_tot": num_tot_temp / args.M, "num_tot_err": np.sqrt(num_tot_temp) / args.M,
+		"d_max": np.mean(d_max_temp), "d_max_err": np.std(d_max_temp) / np.sqrt(args.M),
+		"E_max_tot": np.mean(E_max_temp), "E_max_tot_err": np.std(E_max_temp) / np.sqrt(args.M),
+		"num_max_tot": np.mean(num_max_temp, axis=0), "num_max_tot_err": np.std(num_max_temp, axis=0) / np.sqrt(args.M)
+	}
+
+def curvatura(x, y, y_err, risoluzione):
+	'''
+	Stima, per ogni punto interno di una curva, lo scarto dalla retta che
+	congiunge i punti vicini in unità del suo errore statistico.
+	L'errore di ogni punto non scende sotto la risoluzione della grandezza,
+	così che i tratti deterministici (errore nullo) non risultino curvi.
+
+	Parametri:
+
+		x(np.array): Ascisse ordinate in modo crescente
+
+		y, y_err(np.array): Ordinate con il relativo errore
+
+		risoluzione(float o np.array): Errore minimo attribuito a ogni punto
+
+	Returns:
+
+		z(np.array): Scarto normalizzato per ogni punto, nullo agli estremi
+	'''
+
+	z = np.zeros(len(x))
+	y_err = np.maximum(y_err, risoluzione)
+
+	w = (x[1:-1] - x[:-2]) / (x[2:] - x[:-2])
+	scarto = y[1:-1] - ((1 - w) * y[:-2] + w * y[2:])
+	sigma = np.sqrt(y_err[1:-1]**2 + ((1 - w) * y_err[:-2])**2 + (w * y_err[2:])**2)
+
+	z[1:-1] = np.abs(scarto) / sigma
+
+	return z
+
+def raffina(energie, punti):
+	'''
+	Sceglie la nuova energia da simulare, bisecando (in scala logaritmica)
+	l'intervallo in cui la curvatura di d_STOP e E_TOT, o della differenza
+	tra i materiali, è maggiore rispetto all'errore statistico.
+	Le curvature sono misurate in scala log-log: E_TOT ~ E0 e, sotto Ec,
+	d_STOP ~ E0 diventano rette e resta solo la curvatura del ginocchio.
+	La risoluzione di d_STOP è la sua quantizzazione in passi, s * X0 / sqrt(12),
+	quella di E_TOT la quantizzazione della ionizzazione, dE * s / sqrt(12).
+
+	Parametri:
+
+		energie(list): Energie già simulate [MeV]
+
+		punti(dict): Risultati per materiale ed energia, punti[nome][E]
+
+	Returns:
+
+		E_nuova(float): Energia da aggiungere alla griglia [MeV], None se
+		nessuna curvatura è significativa (soglia corretta con Bonferroni
+		sul numero di punti e di curve, livello 5%)
+	'''
+
+	x = np.log10(energie)
+	z = np.zeros(len(x))
+	nomi = list(punti)
+	curve = 0
+
+	risoluzioni = {
+		"d": {nome: args.s * materiali[nome]["X0"] / np.sqrt(12) for nome in nomi},
+		"E_tot": {nome: args.s * materiali[nome]["dE"] / np.sqrt(12) for nome in nomi}
+	}
+
+	for q, risoluzione in risoluzioni.items():
+
+		valori = {nome: np.maximum([punti[nome][E][q] for E in energie], 1e-12) for nome in nomi}
+
+		y = {nome: np.log10(valori[nome]) for nome in nomi}
+		y_err = {nome: np.array([punti[nome][E][q + "_err"] for E in energie]) / (valori[nome] * np.log(10)) for nome in nomi}
+		y_ris = {nome: risoluzione[nome] / (valori[nome] * np.log(10)) for nome in nomi}
+
+		for nome in nomi:
+			z = np.maximum(z, curvatura(x, y[nome], y_err[nome], y_ris[nome]))
+			curve += 1
+
+		for a in range(len(nomi)):
+			for b in range(a + 1, len(nomi)):
+
+				diff = y[nomi[a]] - y[nomi[b]]
+				diff_err = np.sqrt(y_err[nomi[a]]**2 + y_err[nomi[b]]**2)
+				diff_ris = np.sqrt(y_ris[nomi[a]]**2 + y_ris[nomi[b]]**2)
+				z = np.maximum(z, curvatura(x, diff, diff_err, diff_ris))
+				curve += 1
+
+	soglia = NormalDist().inv_cdf(1 - 0.05 / (2 * curve * max(len(x) - 2, 1)))
+	if np.max(z) < soglia:
+		return None
+
+	priorita = np.diff(x) * np.maximum(z[:-1], z[1:])
+	i = np.argmax(priorita)
+
+	return np.sqrt(energie[i] * energie[i + 1])
+
+punti = {nome: {} for nome in materiali}
+
 for E in energie:
 	for nome, dati in materiali.items():
-		
-		d_temp = []
-		E_tot_temp = []
-		num_tot_temp = np.zeros(3)
-		
-		d_max_temp = []
-		E_max_temp = []
-		num_max_temp = []
-		
-		for i in range(args.M):
-			
-			s1 = Sciame(E, dati["dE"], args.s, dati["Ec"], args.segno)
-			s1.step()
-			
-			d_temp.append(s1.t * args.s * dati["X0"])
-			E_tot_temp.append(s1.energia_totale())
-			num_tot_temp += np.array(s1.contatore_tot)
-			
-			idmax = np.argmax(s1.en_ionizzazione_step)
-			d_max_temp.append(idmax * args.s * dati["X0"])
-			E_max_temp.append(s1.en_ionizzazione_step[idmax])
-			num_max_temp.append([s1.contatore_step[0][idmax], s1.contatore_step[1][idmax], s1.contatore_step[2][idmax]])
-		
-		risultati[nome]["d"].append(np.mean(d_temp))
-		risultati[nome]["d_err"].append(np.std(d_temp) / np.sqrt(args.M))
-		
-		risultati[nome]["E_tot"].append(np.mean(E_tot_temp))
-		risultati[nome]["E_tot_err"].append(np.std(E_tot_temp) / np.sqrt(args.M))
-		
-		risultati[nome]["num_tot"].append(num_tot_temp / args.M)
-		risultati[nome]["num_tot_err"].append(np.sqrt(num_tot_temp) / args.M)
+		telemetria.imposta_cella(materiale=nome, energia=E)
+		punti[nome][E] = simula_punto(E, dati)
 
-		risultati[nome]["d_max"].append(np.mean(d_max_temp))
-		risultati[nome]["d_max_err"].append(np.std(d_max_temp) / np.sqrt(args.M))
-		
-		risultati[nome]["E_max_tot"].append(np.mean(E_max_temp))
-		risultati[nome]["E_max_tot_err"].append(np.std(E_max_temp) / np.sqrt(args.M))
-		
-		risultati[nome]["num_max_tot"].append(np.mean(num_max_temp, axis=0))
-		risultati[nome]["num_max_tot_err"].append(np.std(num_max_temp, axis=0) / np.sqrt(args.M))
+if args.adattivo is not None:
+
+	energie = list(energie)
+
+	while len(energie) < args.adattivo:
+
+		E_nuova = raffina(energie, punti)
+
+		if E_nuova is None:
+
+			print(f"Raffinamento concluso: nessuna curvatura significativa ({len(energie)} punti)")
+			telemetria.totale -= lavoro_punto * (args.adattivo - len(energie))
+			telemetria.lavoro_totale -= lavoro_punto * (args.adattivo - len(energie)) * E_griglia
+			break
+
+		telemetria.lavoro_totale += lavoro_punto * (E_nuova - E_griglia)
+		print(f"Raffinamento: nuovo punto a {E_nuova:.4g} MeV ({len(energie) + 1}/{args.adattivo})")
+
+		for nome, dati in materiali.items():
+			telemetria.imposta_cella(materiale=nome, energia=E_nuova)
+			punti[nome][E_nuova] = simula_punto(E_nuova, dati)
+
+		energie = sorted(energie + [E_nuova])
+
+	energie = np.array(energie)
+
+telemetria.chiudi()
+
+risultati = {}
+for nome in materiali:
+	risultati[nome] = {chiave: [punti[nome][E][chiave] for E in energie] for chiave in punti[nome][energie[0]]}
 
 fig1, ax1 = plt.subplots(2, 1, figsize=(10, 12), sharex=True)
 fig1.suptitle("Statistiche Totali dello Sciame", fontsize=16, fontweight='bold')
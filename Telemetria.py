@@ -0,0 +1,253 @@
+import json
+import os
+import sys
+import threading
+import time
+
+class Telemetria:
+
+	def __init__(self, destinazione, totale, intervallo = 10, lavoro_totale = None):
+		'''
+		Crea il registro di avanzamento di una simulazione, che emette
+		periodicamente una riga JSON con lo stato del calcolo.
+		Le righe periodiche sono scritte da un thread separato, così che
+		anche uno sciame molto lungo o bloccato continui a produrre righe
+		con la cella in corso e il tempo trascorso al suo interno.
+
+		Parametri:
+
+			destinazione(str): File su cui scrivere le righe, "-" per
+			stderr, None per disattivare la telemetria
+
+			totale(int): Numero di sciami previsti
+
+			intervallo(float): Secondi minimi tra due righe, default = 10
+
+			lavoro_totale(float): Somma delle energie iniziali E0 degli
+			sciami previsti [MeV], usata per stimare il tempo rimanente.
+			Il costo di uno sciame cresce circa come E0, quindi la stima
+			basata sul lavoro resta valida anche quando le energie sono
+			simulate in ordine crescente. Se None, la stima usa il numero
+			di sciami
+
+		Attributi:
+
+			sciami(int): Numero di sciami completati
+
+			particelle(int): Numero di particelle prodotte dagli sciami
+			completati
+
+			lavoro(float): Somma delle energie iniziali degli sciami
+			completati [MeV]
+
+			cella(dict): Materiale ed energia in corso di simulazione
+
+			inizio_cella(float): Istante di inizio della cella in corso
+		'''
+
+		if intervallo <= 0:
+			raise ValueError("L'intervallo deve essere positivo")
+		self.intervallo = intervallo
+		self.totale = totale
+		self.lavoro_totale = lavoro_totale
+
+		if destinazione is None:
+			self.flusso = None
+		elif destinazione == "-":
+			self.flusso = sys.stderr
+		else:
+			self.flusso = open(destinazione, "a")
+
+		self.sciami = 0
+		self.particelle = 0
+		self.lavoro = 0.0
+		self.cella = {}
+
+		self.inizio = time.monotonic()
+		self.inizio_cella = self.inizio
+
+		self.blocco = threading.Lock()
+		self.ferma = threading.Event()
+		self.thread = None
+
+		if self.flusso is not None:
+
+			self.thread = threading.Thread(target=self.ciclo, daemon=True)
+			self.thread.start()
+
+	def ciclo(self):
+		'''
+		Emette una riga ogni intervallo secondi, finché la telemetria non
+		viene chiusa. Eseguito nel thread della telemetria.
+
+		Parametri:
+
+			None
+
+		Returns:
+
+			None
+		'''
+
+		while not self.ferma.wait(self.intervallo):
+			self.emetti()
+
+	def imposta_cella(self, **cella):
+		'''
+		Aggiorna la cella (materiale, energia, ...) in corso di simulazione
+		ed emette subito una riga che ne segnala l'inizio.
+
+		Parametri:
+
+			cella: Coppie nome = valore che identificano la cella
+
+		Returns:
+
+			None
+		'''
+
+		self.cella = cella
+		self.inizio_cella = time.monotonic()
+		self.emetti()
+
+	def sciame(self, s1):
+		'''
+		Registra uno sciame completato; le righe sono scritte dal thread
+		della telemetria.
+
+		Parametri:
+
+			s1(Sciame): Sciame di cui è stato eseguito step()
+
+		Returns:
+
+			None
+		'''
+
+		if self.flusso is None:
+			return
+
+		self.sciami += 1
+		self.particelle += sum(s1.contatore_tot)
+		self.lavoro += s1.E0
+
+	def emetti(self, fine = False):
+		'''
+		Scrive una riga JSON con lo stato attuale della simulazione.
+
+		Parametri:
+
+			fine(bool): True per l'ultima riga della simulazione
+
+		Returns:
+
+			None
+		'''
+
+		with self.blocco:
+
+			if self.flusso is None:
+				return
+
+			self.flusso.write(json.dumps(self.riga(fine)) + "\n")
+			self.flusso.flush()
+
+	def riga(self, fine = False):
+		'''
+		Costruisce la riga con lo stato attuale della simulazione.
+
+		Parametri:
+
+			fine(bool): True per l'ultima riga della simulazione
+
+		Returns:
+
+			riga(dict): Stato della simulazione
+		'''
+
+		ora = time.monotonic()
+		trascorso = ora - self.inizio
+		velocita = self.sciami / trascorso if trascorso > 0 else 0.0
+
+		lavoro_s = self.lavoro / trascorso if trascorso > 0 else 0.0
+
+		if self.lavoro_totale and lavoro_s > 0:
+			eta = max(self.lavoro_totale - self.lavoro, 0) / lavoro_s
+		elif self.totale and velocita > 0:
+			eta = max(self.totale - self.sciami, 0) / velocita
+		else:
+			eta = None
+
+		riga = {
+			"tempo": round(trascorso, 3),
+			"sciami": self.sciami,
+			"totale": self.totale,
+			"sciami_s": round(velocita, 3),
+			"particelle_s": round(self.particelle / trascorso, 1) if trascorso > 0 else 0.0,
+			"MeV_s": round(lavoro_s, 1),
+			"eta_s": round(eta, 1) if eta is not None else None,
+			"rss_mb": rss(),
+			"cella_s": round(ora - self.inizio_cella, 3),
+			"fine": fine
+		}
+		riga.update(self.cella)
+
+		return riga
+
+	def chiudi(self):
+		'''
+		Emette la riga finale e chiude il file di destinazione.
+
+		Parametri:
+
+			None
+
+		Returns:
+
+			None
+		'''
+
+		if self.flusso is None:
+			return
+
+		self.ferma.set()
+		self.thread.join()
+
+		self.emetti(fine = True)
+
+		with self.blocco:
+
+			if self.flusso is not sys.stderr:
+				self.flusso.close()
+			self.flusso = None
+
+def rss():
+	'''
+	Restituisce la memoria residente del processo.
+
+	Parametri:
+
+		None
+
+	Returns:
+
+		rss(float): Memoria residente [MB], None se non disponibile
+	'''
+
+	try:
+
+		with open("/proc/self/statm") as f:
+			pagine = int(f.read().split()[1])
+		return round(pagine * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+
+	except (OSError, ValueError, IndexError):
+
+		try:
+
+			import resource
+			massimo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+			return round(massimo / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+		except ImportError:
+
+			return None
@@ -0,0 +1,307 @@
+import argparse
+import importlib
+import itertools
+import random
+import time
+from statistics import NormalDist
+import numpy as np
+from Sciame_EM import Sciame
+from Materiali import materiali
+
+'''
+TEST DI EQUIVALENZA STATISTICA TRA MOTORI DI SIMULAZIONE
+
+Il codice confronta un motore candidato (ad esempio una versione
+vettorizzata o compilata di Sciame.step) con il motore di riferimento
+Sciame_EM.Sciame su una griglia di configurazioni (E0, s, segno, materiale).
+Il candidato deve avere la stessa interfaccia di Sciame: costruttore
+(E0, dE, s, Ec, segno), metodo step() e attributi t, en_ionizzazione_step,
+contatore_step e contatore_tot.
+
+Per ogni configurazione vengono simulati n sciami con entrambi i motori e
+si confrontano:
+
+	- le distribuzioni di energia totale depositata, numero di passi t,
+	posizione del picco e particelle totali per tipo, con il test di
+	Kolmogorov-Smirnov a due campioni
+
+	- i profili medi di dE/dx e del numero di particelle per tipo, passo per
+	passo, entro le bande di errore sulla media
+
+Le soglie sono corrette con Bonferroni sul numero totale di confronti, così
+che alpha sia la probabilità di respingere per errore un motore equivalente.
+
+INPUT (argparse):
+
+	--candidato(str): Motore da validare nella forma modulo:Classe,
+	default = Sciame_EM:Sciame
+
+	--energie(list): Energie iniziali [MeV]
+
+	--passi(list): Passi della simulazione in frazioni di X0
+
+	--segni(list): Particelle iniziali (-1: e-, 0: gamma, 1: e+)
+
+	--materiali(list): Nomi dei materiali definiti in Materiali.py
+
+	-n(int): Numero di sciami per motore e configurazione
+
+	--alpha(float): Probabilità complessiva di falso rifiuto
+
+	--seed(int): Seme dei generatori casuali
+
+RISULTATO:
+
+	Per ogni configurazione: p-value minimo dei test KS, massimo scarto
+	normalizzato dei profili, tempi dei due motori, speedup e verdetto.
+	Il codice termina con stato 1 se almeno una configurazione fallisce.
+'''
+
+GRANDEZZE = ["E_tot", "t", "picco", "N_gamma", "N_el", "N_po"]
+PROFILI = ["dE/dx", "gamma", "e-", "e+"]
+
+def carica_motore(nome):
+	'''
+	Importa la classe di un motore di simulazione.
+
+	Parametri:
+
+		nome(str): Motore nella forma modulo:Classe
+
+	Returns:
+
+		motore(type): Classe del motore
+	'''
+
+	modulo, _, classe = nome.partition(":")
+	if not classe:
+		raise ValueError("Il motore deve essere indicato come modulo:Classe")
+
+	return getattr(importlib.import_module(modulo), classe)
+
+def campiona(motore, E0, s, segno, dati, n, seed):
+	'''
+	Simula n sciami con un motore e ne raccoglie le grandezze osservabili.
+
+	Parametri:
+
+		motore(type): Classe del motore
+
+		E0(float): Energia iniziale [MeV]
+
+		s(float): Passo della simulazione
+
+		segno(int): Particella iniziale
+
+		dati(dict): Parametri fisici del mezzo (dE, Ec)
+
+		n(int): Numero di sciami
+
+		seed(int): Seme dei generatori casuali
+
+	Returns:
+
+		grandezze(np.array): Grandezze per sciame, dimensione (n, 6)
+		nell'ordine di GRANDEZZE
+
+		profili(np.array): Profili per sciame, dimensione (4, n, t_max)
+		nell'ordine di PROFILI
+
+		tempo(float): Tempo di simulazione [s]
+	'''
+
+	random.seed(seed)
+	np.random.seed(seed)
+
+	sciami = []
+	inizio = time.perf_counter()
+
+	for i in range(n):
+
+		s1 = motore(E0, dati["dE"], s, dati["Ec"], segno)
+		s1.step()
+		sciami.append(s1)
+
+	tempo = time.perf_counter() - inizio
+
+	t_max = max(s1.t for s1 in sciami)
+	grandezze = np.zeros((n, len(GRANDEZZE)))
+	profili = np.zeros((len(PROFILI), n, t_max))
+
+	for i, s1 in enumerate(sciami):
+
+		E_step = np.asarray(s1.en_ionizzazione_step, dtype=float)
+		grandezze[i] = [np.sum(E_step), s1.t, np.argmax(E_step), *s1.contatore_tot]
+
+		profili[0, i, :s1.t] = E_step
+		profili[1:, i, :s1.t] = s1.contatore_step
+
+	return grandezze, profili, tempo
+
+def ks_2campioni(x, y):
+	'''
+	Esegue il test di Kolmogorov-Smirnov a due campioni.
+
+	Parametri:
+
+		x, y(np.array): Campioni da confrontare
+
+	Returns:
+
+		D(float): Massima distanza tra le distribuzioni cumulative
+
+		p(float): p-value asintotico
+	'''
+
+	x = np.sort(x)
+	y = np.sort(y)
+	valori = np.concatenate([x, y])
+
+	cdf_x = np.searchsorted(x, valori, side="right") / len(x)
+	cdf_y = np.searchsorted(y, valori, side="right") / len(y)
+	D = np.max(np.abs(cdf_x - cdf_y))
+
+	en = np.sqrt(len(x) * len(y) / (len(x) + len(y)))
+	lam = (en + 0.12 + 0.11 / en) * D
+
+	if lam < 1e-3:
+		return D, 1.0
+
+	k = np.arange(1, 101)
+	p = 2 * np.sum((-1.0)**(k - 1) * np.exp(-2 * k**2 * lam**2))
+
+	return D, float(min(max(p, 0.0), 1.0))
+
+def scarto_profili(p_ref, p_cand):
+	'''
+	Calcola lo scarto massimo tra i profili medi dei due motori, passo per
+	passo, in unità dell'errore combinato sulla media.
+
+	Parametri:
+
+		p_ref, p_cand(np.array): Profili per sciame, dimensione (4, n, t)
+
+	Returns:
+
+		z(float): Massimo scarto normalizzato
+
+		confronti(int): Numero di passi confrontati
+	'''
+
+	t_max = max(p_ref.shape[2], p_cand.shape[2])
+	p_ref = np.pad(p_ref, ((0, 0), (0, 0), (0, t_max - p_ref.shape[2])))
+	p_cand = np.pad(p_cand, ((0, 0), (0, 0), (0, t_max - p_cand.shape[2])))
+
+	diff = np.mean(p_ref, axis=1) - np.mean(p_cand, axis=1)
+	err = np.sqrt(np.var(p_ref, axis=1) / p_ref.shape[1] + np.var(p_cand, axis=1) / p_cand.shape[1])
+
+	validi = err > 0
+	if np.any(np.abs(diff[~validi]) > 0):
+		return np.inf, int(np.sum(validi))
+
+	if not np.any(validi):
+		return 0.0, 0
+
+	return float(np.max(np.abs(diff[validi]) / err[validi])), int(np.sum(validi))
+
+def confronta(candidato, energie, passi, segni, nomi, n, alpha, seed):
+	'''
+	Confronta il motore candidato con quello di riferimento su tutta la
+	griglia di configurazioni.
+
+	Parametri:
+
+		candidato(type): Classe del motore candidato
+
+		energie, passi, segni, nomi(list): Griglia di configurazioni
+
+		n(int): Numero di sciami per motore e configurazione
+
+		alpha(float): Probabilità complessiva di falso rifiuto
+
+		seed(int): Seme dei generatori casuali
+
+	Returns:
+
+		righe(list): Risultato per configurazione (dict)
+
+		superato(bool): True se tutte le configurazioni superano il test
+	'''
+
+	griglia = list(itertools.product(energie, passi, segni, nomi))
+	campioni = []
+
+	for j, (E0, s, segno, nome) in enumerate(griglia):
+
+		ref = campiona(Sciame, E0, s, segno, materiali[nome], n, seed + 2 * j)
+		cand = campiona(candidato, E0, s, segno, materiali[nome], n, seed + 2 * j + 1)
+		campioni.append((ref, cand))
+
+	scarti = [scarto_profili(ref[1], cand[1]) for ref, cand in campioni]
+	confronti = len(griglia) * len(GRANDEZZE) + sum(c for _, c in scarti)
+
+	alpha_c = alpha / max(confronti, 1)
+	z_crit = NormalDist().inv_cdf(1 - alpha_c / 2)
+
+	righe = []
+
+	for (E0, s, segno, nome), (ref, cand), (z, _) in zip(griglia, campioni, scarti):
+
+		p_ks = {q: ks_2campioni(ref[0][:, k], cand[0][:, k])[1] for k, q in enumerate(GRANDEZZE)}
+
+		esito = min(p_ks.values()) >= alpha_c and z <= z_crit
+
+		righe.append({
+			"E0": E0, "s": s, "segno": segno, "materiale": nome,
+			"p_ks": p_ks, "z_profili": z,
+			"t_ref": ref[2], "t_cand": cand[2],
+			"speedup": ref[2] / cand[2] if cand[2] > 0 else np.inf,
+			"esito": esito
+		})
+
+	return righe, all(r["esito"] for r in righe)
+
+if __name__ == "__main__":
+
+	parser = argparse.ArgumentParser(description="Test di equivalenza statistica tra motori di simulazione")
+	parser.add_argument("--candidato", default="Sciame_EM:Sciame", help="Motore da validare (modulo:Classe)")
+	parser.add_argument("--energie", type=float, nargs="+", default=[100, 1000], help="Energie iniziali [MeV]")
+	parser.add_argument("--passi", type=float, nargs="+", default=[0.5], help="Passi della simulazione")
+	parser.add_argument("--segni", type=int, nargs="+", choices=[-1,0,1], default=[-1, 0], help="Particelle iniziali")
+	parser.add_argument("--materiali", nargs="+", choices=list(materiali), default=list(materiali), help="Materiali")
+	parser.add_argument("-n", type=int, default=200, help="Sciami per motore e configurazione")
+	parser.add_argument("--alpha", type=float, default=0.01, help="Probabilità complessiva di falso rifiuto")
+	parser.add_argument("--seed", type=int, default=0, help="Seme dei generatori casuali")
+	args = parser.parse_args()
+
+	if args.n < 2:
+		parser.error("Servono almeno 2 sciami per configurazione")
+
+	candidato = carica_motore(args.candidato)
+
+	print(f"Confronto di {args.candidato} con Sciame_EM:Sciame su "
+		f"{len(args.energie) * len(args.passi) * len(args.segni) * len(args.materiali)} configurazioni "
+		f"({args.n} sciami per motore)\n")
+
+	righe, superato = confronta(candidato, args.energie, args.passi, args.segni, args.materiali, args.n, args.alpha, args.seed)
+
+	print(f"{'E0 [MeV]':>10} {'s':>5} {'segno':>5} {'materiale':>10} {'p_KS min':>9} {'z prof.':>8} "
+		f"{'t_ref [s]':>10} {'t_cand [s]':>10} {'speedup':>8}  esito")
+
+	for r in righe:
+
+		print(f"{r['E0']:>10g} {r['s']:>5g} {r['segno']:>5d} {r['materiale']:>10} "
+			f"{min(r['p_ks'].values()):>9.3g} {r['z_profili']:>8.2f} "
+			f"{r['t_ref']:>10.3f} {r['t_cand']:>10.3f} {r['speedup']:>8.2f}  "
+			f"{'OK' if r['esito'] else 'FALLITO'}")
+
+		if not r["esito"]:
+			print("            p_KS: " + ", ".join(f"{q} = {p:.3g}" for q, p in r["p_ks"].items()))
+
+	t_ref = sum(r["t_ref"] for r in righe)
+	t_cand = sum(r["t_cand"] for r in righe)
+
+	print(f"\nSpeedup complessivo: {t_ref / t_cand:.2f}x")
+	print(f"Verdetto: {'EQUIVALENTE' if superato else 'NON EQUIVALENTE'}")
+
+	raise SystemExit(0 if superato else 1)
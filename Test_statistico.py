@@ -1,5 +1,6 @@
 import matplotlib.pyplot as plt
 from Sciame_EM import Sciame
+from Telemetria import Telemetria
 import argparse
 import numpy as np 
 
@@ -26,11 +27,18 @@ INPUT (argparse):
 	n(int): Numero di sciami per la media statistica
 	
 	X0(float): Lunghezza di radiazione del materiale [cm]
+	
+	telemetria(str, opzionale): File su cui scrivere righe JSON di 
+	avanzamento ("-" per stderr)
+	
+	intervallo(float, opzionale): Secondi tra due righe di telemetria
 
 VARIABILI:
 
 	sciami(list): Oggetti Sciame simulati
 	
+	telemetria(Telemetria): Registro dell'avanzamento della simulazione
+	
 	E_totali(list): Energie totali depositate per ogni singolo sciame
 	
 	Num_totali, err(np.array): Numero medio finale di fotoni, elettroni e positroni con relativo errore sulla media
@@ -69,6 +77,8 @@ parser.add_argument("Ece", type=float, help="Energia critica elettrone [MeV]")
 parser.add_argument("Ecp", type=float, help="Energia critica positrone [MeV]")
 parser.add_argument("n", type=int, help="Numero di sciami da simulare")
 parser.add_argument("X0", type=float, help="Lunghezza di radiazione [cm]")
+parser.add_argument("--telemetria", default=None, help="File per le righe JSON di avanzamento, '-' per stderr")
+parser.add_argument("--intervallo", type=float, default=10, help="Secondi tra due righe di telemetria")
 args = parser.parse_args()
     
 print(f"Avvio simulazione di {args.n} sciami")
@@ -78,17 +88,22 @@ E_totali = []
 Num_totali = np.zeros(3)
 d_max = 0
 
+telemetria = Telemetria(args.telemetria, args.n, args.intervallo, args.n * args.E0)
+telemetria.imposta_cella(energia=args.E0)
 
 for i in range(args.n):
 	
 	s1 = Sciame(args.E0, args.dE, args.s, [args.Ece, args.Ecp], args.segno)
 	s1.step()
+	telemetria.sciame(s1)
 	sciami.append(s1)
     
 	E_totali.append(s1.energia_totale())
 	Num_totali += np.array(s1.contatore_tot)
 	d_max += np.argmax(np.array(s1.en_ionizzazione_step)) 
 
+telemetria.chiudi()
+
 d_max = d_max * args.s * args.X0 / args.n
 Num_totali = Num_totali / args.n
 